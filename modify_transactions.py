@@ -1,4 +1,6 @@
 import json
+import math
+import orjson
 import pandas as pd
 import numpy as np
 import sys
@@ -9,6 +11,8 @@ BLOCKS_PER_INTERVAL = 50  # Transactions grouped per 50 blocks
 PUMP_THRESHOLD = 2500  # Total ETH required to trigger a pump event
 WHALE_THRESHOLD = 1000  # Individual transactions above this are whales
 PUMP_INTERVALS = 3  # Consecutive intervals where transactions will increase
+WRITE_BUFFER_SIZE = 1024 * 1024  # Output buffer for JSONL writes
+WRITE_BATCH_ROWS = 50_000  # Rows serialized per write in save_jsonl
 
 def load_jsonl(file_path):
     """Loads a JSONL file into a Pandas DataFrame."""
@@ -18,25 +22,48 @@ def load_jsonl(file_path):
             data.append(json.loads(line.strip()))
     return pd.DataFrame(data)
 
+def null_non_finite(value):
+    """Replaces NaN/inf floats (at any depth) with None, as orjson writes them."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: null_non_finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [null_non_finite(item) for item in value]
+    return value
+
+def dumps_record(record):
+    """Serializes a single record to JSON bytes."""
+    try:
+        return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # orjson only handles 64-bit integers; raw wei amounts can be larger.
+        # Write missing values as null here too, never as bare NaN
+        return json.dumps(null_non_finite(record), allow_nan=False, default=lambda value: value.item()).encode("utf-8")
+
 def save_jsonl(df, output_path):
     """Saves a DataFrame to a JSONL file."""
-    with open(output_path, "w") as file:
-        for record in df.to_dict(orient="records"):
-            file.write(json.dumps(record) + "\n")
+    columns = list(df.columns)
+    with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as file:
+        for start in range(0, len(df), WRITE_BATCH_ROWS):
+            batch = df.iloc[start:start + WRITE_BATCH_ROWS]
+            # tolist() unboxes each column to Python scalars in one C pass
+            values = [batch[column].tolist() for column in columns]
+            file.write(b"".join(dumps_record(dict(zip(columns, row))) + b"\n" for row in zip(*values)))
 
 def modify_transactions(file_paths, output_folder="modified_data"):
     # Load all JSONL files
     df_list = [load_jsonl(fp) for fp in file_paths]
     df = pd.concat(df_list, ignore_index=True)
 
-    # Convert transaction values from hex or string if needed
-    def safe_eth_conversion(value):
-        if isinstance(value, str) and value.startswith("0x"):
-            return int(value, 16) / 10**18
-        elif isinstance(value, (int, float)):
-            return value / 10**18
-        return 0
-
-    df["value"] = df["transaction"].apply(lambda tx: safe_eth_conversion(tx.get("value", "0")))
+    # Convert transaction values from hex or string if needed, in one
+    # comprehension rather than a per-row apply/lambda dispatch
+    df["value"] = [
+        value / 10**18 if isinstance(value, (int, float))
+        else int(value, 16) / 10**18 if isinstance(value, str) and value.startswith("0x")
+        else 0
+        for tx in df["transaction"].to_numpy()
+        for value in (tx.get("value", "0"),)
+    ]
     df["block_number"] = df["block_number"].astype(int)
     df["block_interval"] = df["block_number"]
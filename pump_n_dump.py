@@ -1,185 +1,179 @@
 #!/usr/bin/env python3
 
-import json
+import gc
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 
-def flatten_transaction_record(record):
-    """
-    Given a single transaction record from the JSONL (which typically has:
-       - block_number
-       - block_timestamp
-       - transaction (dict)
-       - receipt (dict)
-    flatten it into a single dict of top-level fields + transaction fields + receipt fields.
-    Returns (flattened_dict, logs_list).
-    """
-    flattened = {}
-    logs_list = []
-
-    # -------------------------------------------------------------------------
-    # 1) Extract top-level fields
-    # -------------------------------------------------------------------------
-    flattened["block_number"] = record.get("block_number")
-    flattened["block_timestamp"] = record.get("block_timestamp")
-
-    # -------------------------------------------------------------------------
-    # 2) Flatten 'transaction' fields (prefix them with 'tx_' to avoid collisions)
-    # -------------------------------------------------------------------------
-    tx = record.get("transaction", {})
-    flattened["tx_hash"] = tx.get("hash")
-    flattened["tx_from"] = tx.get("from")
-    flattened["tx_to"]   = tx.get("to")
-    flattened["tx_nonce"] = tx.get("nonce")
-    flattened["tx_value"] = tx.get("value")
-    flattened["tx_gas"]   = tx.get("gas")
-    flattened["tx_gasPrice"] = tx.get("gasPrice")
-    flattened["tx_input"]    = tx.get("input")
-    flattened["tx_chainId"]  = tx.get("chainId")
-    # ... add any other transaction fields you want
-
-    # -------------------------------------------------------------------------
-    # 3) Flatten 'receipt' fields (prefix them with 'rcpt_')
-    # -------------------------------------------------------------------------
-    rcpt = record.get("receipt", {})
-    flattened["rcpt_status"] = rcpt.get("status")
-    flattened["rcpt_gasUsed"] = rcpt.get("gasUsed")
-    flattened["rcpt_contractAddress"] = rcpt.get("contractAddress")
-    # ... add any other receipt fields you want
-
-    # -------------------------------------------------------------------------
-    # 4) Extract logs from the receipt
-    # -------------------------------------------------------------------------
-    logs = rcpt.get("logs", [])
-
-    if logs:
-        flattened["tx_token_type"] = logs[0].get("address")
-    else:
-        flattened["tx_token_type"] = None
-
-    for log in logs:
-        # Each log might have address, data, topics, etc.
-        # We'll store them in a structure that references the transaction hash
-        # (so we can link logs to transactions in another DataFrame).
-        log_entry = {
-            "tx_hash": tx.get("hash"),
-            "block_number": record.get("block_number"),
-            "logIndex": log.get("logIndex"),
-            "address": log.get("address"),
-            "data": log.get("data"),
-            "removed": log.get("removed"),
-            "topics": log.get("topics"),
-        }
-        logs_list.append(log_entry)
-
-    return flattened, logs_list
-
-
-def load_transactions_and_logs(jsonl_path):
+from transaction_loader import load_transactions_and_logs
+
+def scan_interval_changes(values, tokens, lag, threshold):
     """
-    Reads the .jsonl file line by line, flattens each record into:
-      1) transaction-level data (transactions_df)
-      2) logs-level data (logs_df)
-    Returns two Pandas DataFrames.
+    Compares each interval sum with the one lag positions earlier, for
+    contiguous arrays sorted by token and then interval. Positions whose
+    predecessor belongs to another token are never compared.
+    Returns (previous_values, pump_idx, dump_idx).
     """
-    all_tx = []
-    all_logs = []
+    previous = np.full(len(values), np.nan)
+    if lag < len(values):
+        same_token = tokens[lag:] == tokens[:len(values) - lag]
+        previous[lag:] = np.where(same_token, values[:len(values) - lag], np.nan)
+    difference = values - previous
 
-    with open(jsonl_path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            record = json.loads(line)
-            tx_flat, logs_list = flatten_transaction_record(record)
+    # A change can only be one or the other; pumps win if both hold
+    is_pump = difference > threshold
+    pump_idx = np.flatnonzero(is_pump)
+    dump_idx = np.flatnonzero((difference < -threshold) & ~is_pump)
 
-            all_tx.append(tx_flat)
-            all_logs.extend(logs_list)
-
-    transactions_df = pd.DataFrame(all_tx)
-    logs_df = pd.DataFrame(all_logs)
-
-    return transactions_df, logs_df
+    return previous, pump_idx, dump_idx
 
 # Detect pump and dump events including whale movements
-def detect_pump_and_dump_whale_not_included(transactions_df, pump_threshold_value, pump_threshold_interval, interval_blocks):
-    # Ensure the DataFrame is sorted by block number
+def detect_pump_and_dump_whale_not_included(transactions_df, pump_threshold_value, pump_threshold_interval, interval_blocks, out=None):
+    # The report goes to stdout unless the caller collects it elsewhere
+    if out is None:
+        out = sys.stdout
+
+    # Drop whale transactions, then order the rest by block number with a
+    # stable argsort over the raw arrays rather than sorting the whole frame
     whale_cap = 500 # eth
-    transactions_df = transactions_df.sort_values(by="block_number")
-    transactions_df = transactions_df[transactions_df["tx_value_eth"] < whale_cap]
+    block_numbers = transactions_df["block_number"].to_numpy()
+    values = transactions_df["tx_value_eth"].to_numpy()
+    keep = np.flatnonzero(values < whale_cap)
+    keep = keep[np.argsort(block_numbers[keep], kind="stable")]
+    values = values[keep]
 
     # Determine the interval for each transaction based on the block number
-    transactions_df["interval"] = (transactions_df["block_number"] // interval_blocks) + 1
+    intervals = (block_numbers[keep] // interval_blocks) + 1
 
-    # Aggregate the transaction values by interval and token type
-    interval_sums = transactions_df.groupby(["interval", "tx_token_type"])["tx_value_eth"].sum().reset_index()
+    # Aggregate the transaction values by interval and token type. Each pair
+    # is packed into one integer key so the sums take a single bincount pass;
+    # the sorted unique keys come out ordered by interval, then token.
+    tokens = transactions_df["tx_token_type"].astype("category")
+    token_codes = tokens.cat.codes.to_numpy()[keep]
+    has_token = token_codes >= 0
+    num_tokens = max(len(tokens.cat.categories), 1)
 
-    print("Interval Sums:\n", interval_sums.to_string(index=False))
+    keys = intervals[has_token].astype(np.int64) * num_tokens + token_codes[has_token]
+    unique_keys, group_index = np.unique(keys, return_inverse=True)
+    sums = np.bincount(group_index, weights=values[has_token], minlength=len(unique_keys))
 
-    pump_intervals = []
-    dump_intervals = []
+    # The per-transaction keys are not needed past this point; release them
+    # before the report is built rather than at function exit
+    del keys, group_index, token_codes, has_token, values
+
+    sum_intervals = unique_keys // num_tokens
+    sum_tokens = unique_keys % num_tokens
+
+    interval_sums = pd.DataFrame({
+        "interval": sum_intervals,
+        "tx_token_type": pd.Categorical.from_codes(sum_tokens, categories=tokens.cat.categories),
+        "tx_value_eth": sums,
+    })
+
+    print("Interval Sums:\n", interval_sums.to_string(index=False), file=out)
 
     # Group by token type
-    grouped = interval_sums.groupby("tx_token_type")
+    grouped = interval_sums.groupby("tx_token_type", observed=True)
     for i, (token_type, group) in zip(range(2), grouped):
-        print(f"Group {i+1}: Token Type {token_type}\n{group}\n")
-
-    for token_type, group in grouped:
-        for i in range(pump_threshold_interval, len(group) + 1):
-            current_interval_sum = group.iloc[i - 1]["tx_value_eth"]
-            previous_interval_sum = group.iloc[i - pump_threshold_interval]["tx_value_eth"]
-            difference = current_interval_sum - previous_interval_sum
-
-            if difference > pump_threshold_value:
-                pump_intervals.append({
-                    "interval": group.iloc[i - 1]["interval"],
-                    "token_type": token_type,
-                    "current_interval_sum": current_interval_sum,
-                    "previous_interval_sum": previous_interval_sum,
-                    "difference": difference
-                })
-            elif difference < -pump_threshold_value:
-                dump_intervals.append({
-                    "interval": group.iloc[i - 1]["interval"],
-                    "token_type": token_type,
-                    "current_interval_sum": current_interval_sum,
-                    "previous_interval_sum": previous_interval_sum,
-                    "difference": difference
-                })
-
-    # Print detailed transaction information for pump and dump intervals
+        print(f"Group {i+1}: Token Type {token_type}\n{group}\n", file=out)
+
+    # Compare each interval sum with the one pump_threshold_interval - 1 rows
+    # earlier for the same token; only the rows crossing the threshold are
+    # turned back into records.
+    order = np.lexsort((sum_intervals, sum_tokens))
+    current = sums[order]
+    current_tokens = sum_tokens[order]
+    current_intervals = sum_intervals[order]
+
+    previous, pump_idx, dump_idx = scan_interval_changes(current, current_tokens, pump_threshold_interval - 1, pump_threshold_value)
+
+    def interval_changes(idx):
+        return pd.DataFrame({
+            "interval": current_intervals[idx],
+            "token_type": tokens.cat.categories[current_tokens[idx]],
+            "current_interval_sum": current[idx],
+            "previous_interval_sum": previous[idx],
+            "difference": current[idx] - previous[idx],
+        }).to_dict(orient="records")
+
+    pump_intervals = interval_changes(pump_idx)
+    dump_intervals = interval_changes(dump_idx)
+
+    # The filtered transactions are only materialized as a DataFrame when
+    # there are details to print
+    if not pump_intervals and not dump_intervals:
+        return pump_intervals, dump_intervals
+
+    transactions_df = transactions_df.iloc[keep].assign(interval=intervals)
+
+    # Index the transactions by token once; each group is already in block
+    # order, so an interval window is a contiguous slice found by bisection
+    transactions_by_token = transactions_df.groupby("tx_token_type", observed=True, sort=False)
+
+    def transactions_in_window(token_type, interval):
+        group = transactions_by_token.get_group(token_type)
+        intervals = group["interval"]
+        start = intervals.searchsorted(interval - 2, side="left")
+        stop = intervals.searchsorted(interval, side="right")
+        return group.iloc[start:stop]
+
+    # Print detailed transaction information for pump and dump intervals,
+    # collected in memory and written to stdout in one go
+    details = io.StringIO()
     if pump_intervals:
-        print("Pump Intervals Details:")
+        print("Pump Intervals Details:", file=details)
         for pump in pump_intervals:
             interval = pump["interval"]
             token_type = pump["token_type"]
-            relevant_transactions = transactions_df[
-                (transactions_df["interval"] >= interval - 2) &
-                (transactions_df["interval"] <= interval) &
-                (transactions_df["tx_token_type"] == token_type)
-            ]
-            print(f"Interval: {interval}, Token Type: {token_type}\n{relevant_transactions[['interval', 'tx_token_type', 'tx_value_eth', 'block_timestamp']]}\n")
+            relevant_transactions = transactions_in_window(token_type, interval)
+            print(f"Interval: {interval}, Token Type: {token_type}\n{relevant_transactions[['interval', 'tx_token_type', 'tx_value_eth', 'block_timestamp']]}\n", file=details)
 
     if dump_intervals:
-        print("Dump Intervals Details:")
+        print("Dump Intervals Details:", file=details)
         for dump in dump_intervals:
             interval = dump["interval"]
             token_type = dump["token_type"]
-            relevant_transactions = transactions_df[
-                (transactions_df["interval"] >= interval - 2) &
-                (transactions_df["interval"] <= interval) &
-                (transactions_df["tx_token_type"] == token_type)
-            ]
-            print(f"Interval: {interval}, Token Type: {token_type}\n{relevant_transactions[['interval', 'tx_token_type', 'tx_value_eth', 'block_timestamp']]}\n")
+            relevant_transactions = transactions_in_window(token_type, interval)
+            print(f"Interval: {interval}, Token Type: {token_type}\n{relevant_transactions[['interval', 'tx_token_type', 'tx_value_eth', 'block_timestamp']]}\n", file=details)
+
+    out.write(details.getvalue())
 
     return pump_intervals, dump_intervals
 
 
+def detect_anomalies(features_df):
+    """
+    Fits an IsolationForest on the given numeric feature columns.
+    Returns (anomaly_score, is_anomaly) arrays aligned with features_df.
+    """
+    # Fill missing numeric fields with 0; sklearn trains on float32 anyway
+    X = np.ascontiguousarray(features_df.fillna(0).to_numpy(dtype=np.float32))
+
+    # Create and fit the model, building the trees on all cores
+    iso = IsolationForest(contamination=0.01, n_jobs=-1)  # ~1% anomalies
+    iso.fit(X)
+
+    # Walk the trees once: decision_function is score_samples shifted by
+    # offset_, and predict only checks its sign
+    # anomaly_score => higher = more normal, lower = more anomalous
+    # is_anomaly => -1 = anomaly, 1 = normal
+    anomaly_score = iso.score_samples(X) - iso.offset_
+    return anomaly_score, np.where(anomaly_score < 0, -1, 1)
+
+
 if __name__ == "__main__":
     # 1) Load the flattened data (in memory)
     jsonl_file = "../data/transaction_data.jsonl"
     transactions_df, logs_df = load_transactions_and_logs(jsonl_file)
 
+    # Addresses repeat heavily; categorical codes make the groupbys hash ints
+    for column in ("tx_token_type", "tx_from", "tx_to"):
+        transactions_df[column] = transactions_df[column].astype("category")
+
     transactions_df["tx_value_eth"] = transactions_df["tx_value"] / 1e10
 
     # 2) Print quick previews
@@ -191,26 +185,35 @@ if __name__ == "__main__":
     print(f"\nNumber of transactions: {len(transactions_df)}")
     print(f"Number of logs: {len(logs_df)}")
 
+    # The logs are only previewed; free them before the analysis passes
+    del logs_df
+    gc.collect()
+
     # 3) Example grouping: how many transactions each sender has
-    tx_count_by_sender = transactions_df.groupby("tx_from")["tx_hash"].count()
+    tx_count_by_sender = transactions_df.groupby("tx_from", observed=True, sort=False)["tx_hash"].count()
     tx_count_by_sender.sort_values(ascending=False, inplace=True)
     print(f"\nTop 10 Senders:\n{tx_count_by_sender.head(10)}")
 
-    # 4) Simple anomaly detection with IsolationForest
-    #    We'll pick a few numeric fields
+    # 4) Simple anomaly detection with IsolationForest on a few numeric
+    #    fields. It only reads the feature columns, so it runs in a worker
+    #    thread while the pump and dump scan below works on the others; the
+    #    scan's report is buffered so the output keeps its original order.
     features = ["rcpt_gasUsed", "tx_value", "tx_gasPrice"]
-    # Fill missing numeric fields with 0
-    X = transactions_df[features].fillna(0)
+    pump_columns = ["block_number", "block_timestamp", "tx_token_type", "tx_value_eth"]
+    report = io.StringIO()
 
-    # Create and fit the model
-    iso = IsolationForest(contamination=0.01)  # ~1% anomalies
-    iso.fit(X)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        anomaly_future = pool.submit(detect_anomalies, transactions_df[features])
+
+        # Detect pump and dump patterns
+        interval_blocks = 50  # 10 minutes = 50 blocks
+        pump_threshold_value = 2500 # eth
+        pump_threshold_interval = 3  # 3 intervals
+
+        pump_intervals, dump_intervals = detect_pump_and_dump_whale_not_included(transactions_df[pump_columns], pump_threshold_value, pump_threshold_interval, interval_blocks, out=report)
 
-    # Store scores in the DataFrame
-    # decision_function => higher = more normal, lower = more anomalous
-    transactions_df["anomaly_score"] = iso.decision_function(X)
-    # predict => -1 = anomaly, 1 = normal
-    transactions_df["is_anomaly"] = iso.predict(X)
+        # Store scores in the DataFrame
+        transactions_df["anomaly_score"], transactions_df["is_anomaly"] = anomaly_future.result()
 
     # 5) Inspect suspicious transactions
     anomalies = transactions_df[transactions_df["is_anomaly"] == -1]
@@ -219,21 +222,14 @@ if __name__ == "__main__":
     print("\nAnomalies:")
     print(anomalies.head(20))
 
-    # Detect pump and dump patterns
-    interval_blocks = 50  # 10 minutes = 50 blocks
-    pump_threshold_value = 2500 # eth
-    pump_threshold_interval = 3  # 3 intervals
-
-    pump_intervals, dump_intervals = detect_pump_and_dump_whale_not_included(transactions_df, pump_threshold_value, pump_threshold_interval, interval_blocks)
-
-    # Print detailed pump and dump intervals
-    print("\nPump Intervals:")
+    # Print detailed pump and dump intervals after the buffered scan report
+    print("\nPump Intervals:", file=report)
     for pump in pump_intervals:
-        print(f"Interval: {pump['interval']}, Token Type: {pump['token_type']}, Current Sum: {pump['current_interval_sum']},")
-        print(f"    Previous Sum: {pump['previous_interval_sum']}, Difference: {pump['difference']}")
+        print(f"Interval: {pump['interval']}, Token Type: {pump['token_type']}, Current Sum: {pump['current_interval_sum']},", file=report)
+        print(f"    Previous Sum: {pump['previous_interval_sum']}, Difference: {pump['difference']}", file=report)
 
-    print("\nDump Intervals:")
+    print("\nDump Intervals:", file=report)
     for dump in dump_intervals:
-        print(f"Interval: {dump['interval']}, Token Type: {dump['token_type']}, Current Sum: {dump['current_interval_sum']},")
-        print(f"    Previous Sum: {dump['previous_interval_sum']}, Difference: {dump['difference']}")
-
+        print(f"Interval: {dump['interval']}, Token Type: {dump['token_type']}, Current Sum: {dump['current_interval_sum']},", file=report)
+        print(f"    Previous Sum: {dump['previous_interval_sum']}, Difference: {dump['difference']}", file=report)
+    sys.stdout.write(report.getvalue())
@@ -1,31 +1,64 @@
+import mmap
 import os
+import sys
+
+# Same gate as shutil: only Linux can sendfile into a regular file; macOS and
+# the BSDs require the destination to be a socket
+USE_SENDFILE = hasattr(os, 'sendfile') and sys.platform.startswith('linux')
+
+
+def copy_range(infile, outfile, mm, start, end):
+    """Copies bytes [start, end) of the mapped input file into outfile."""
+    offset = start
+    if USE_SENDFILE:
+        # Kernel-side copy; the bytes never pass through userspace
+        try:
+            while offset < end:
+                sent = os.sendfile(outfile.fileno(), infile.fileno(), offset, end - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError:
+            # e.g. EINVAL/ENOSYS on filesystems without sendfile support;
+            # write whatever has not been copied yet from the mapping
+            pass
+
+    if offset < end:
+        outfile.write(mm[offset:end])
+
 
 def split_jsonl(input_path, chunk_size=150 * 1024 * 1024, output_prefix='chunk_'):
-    with open(input_path, 'r', encoding='utf-8') as infile:
-        chunk_index = 1
-        current_chunk_size = 0
-        outfile_path = f"{output_prefix}{chunk_index}.jsonl"
-        outfile = open(outfile_path, 'w', encoding='utf-8')
-
-        for line in infile:
-            line_size = len(line.encode('utf-8'))
-
-            # If this line would exceed limit, start a new file
-            if current_chunk_size + line_size > chunk_size:
-                outfile.close()
-                chunk_index += 1
-                current_chunk_size = 0
-                outfile_path = f"{output_prefix}{chunk_index}.jsonl"
-                outfile = open(outfile_path, 'w', encoding='utf-8')
+    with open(input_path, 'rb') as infile:
+        file_size = os.fstat(infile.fileno()).st_size
+        if file_size == 0:
+            open(f"{output_prefix}1.jsonl", 'wb').close()
+            return
+
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
 
-            outfile.write(line)
-            current_chunk_size += line_size
+            chunk_index = 1
+            position = 0
+            while position < file_size:
+                if file_size - position <= chunk_size:
+                    split_at = file_size
+                else:
+                    # Cut after the last newline that still fits in this chunk
+                    split_at = mm.rfind(b'\n', position, position + chunk_size) + 1
+                    if split_at == 0:
+                        # A single line longer than chunk_size gets its own file
+                        split_at = mm.find(b'\n', position) + 1 or file_size
 
-        outfile.close()
+                outfile_path = f"{output_prefix}{chunk_index}.jsonl"
+                with open(outfile_path, 'wb') as outfile:
+                    copy_range(infile, outfile, mm, position, split_at)
+
+                chunk_index += 1
+                position = split_at
 
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) < 2:
         print("Usage: python split_jsonl.py <input.jsonl> [chunk_size_in_MB] [output_prefix]")
         sys.exit(1)
@@ -0,0 +1,95 @@
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as paj
+
+# Only the fields below are decoded; everything else in the JSONL is skipped
+# by the Arrow parser. tx_value is read as float64 because wei amounts
+# regularly exceed the int64 range.
+TRANSACTION_SCHEMA = pa.struct([
+    ("hash", pa.string()),
+    ("from", pa.string()),
+    ("to", pa.string()),
+    ("nonce", pa.int64()),
+    ("value", pa.float64()),
+    ("gas", pa.int64()),
+    ("gasPrice", pa.int64()),
+    ("input", pa.string()),
+    ("chainId", pa.int64()),
+])
+
+LOG_SCHEMA = pa.struct([
+    ("logIndex", pa.int64()),
+    ("address", pa.string()),
+    ("data", pa.string()),
+    ("removed", pa.bool_()),
+    ("topics", pa.list_(pa.string())),
+])
+
+RECEIPT_SCHEMA = pa.struct([
+    ("status", pa.int64()),
+    ("gasUsed", pa.int64()),
+    ("contractAddress", pa.string()),
+    ("logs", pa.list_(LOG_SCHEMA)),
+])
+
+RECORD_SCHEMA = pa.schema([
+    ("block_number", pa.int64()),
+    ("block_timestamp", pa.string()),
+    ("transaction", TRANSACTION_SCHEMA),
+    ("receipt", RECEIPT_SCHEMA),
+])
+
+READ_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+def load_transactions_and_logs(jsonl_path):
+    """
+    Parses the .jsonl file with Arrow's multi-threaded JSON reader and
+    projects the nested records into:
+      1) transaction-level data (transactions_df)
+      2) logs-level data (logs_df)
+    Returns two Pandas DataFrames.
+    """
+    if os.path.getsize(jsonl_path) == 0:
+        # Arrow rejects empty input; project an empty table of the same
+        # schema so both frames still come back with their usual columns
+        table = RECORD_SCHEMA.empty_table()
+    else:
+        table = paj.read_json(
+            jsonl_path,
+            read_options=paj.ReadOptions(block_size=READ_BLOCK_SIZE),
+            parse_options=paj.ParseOptions(
+                explicit_schema=RECORD_SCHEMA,
+                unexpected_field_behavior="ignore",
+            ),
+        )
+
+    # -------------------------------------------------------------------------
+    # 1) Flatten 'transaction' (tx_) and 'receipt' (rcpt_) structs into columns
+    # -------------------------------------------------------------------------
+    flat = table.flatten()
+    logs = flat.column("receipt.logs")
+    columns = [name for name in flat.column_names if name != "receipt.logs"]
+    transactions = flat.select(columns).rename_columns(
+        [name.replace("transaction.", "tx_").replace("receipt.", "rcpt_") for name in columns]
+    )
+
+    # The first log's address identifies the token moved by the transaction
+    log_counts = pc.fill_null(pc.list_value_length(logs), 0)
+    first_log = pc.list_element(pc.if_else(pc.greater(log_counts, 0), logs, None), 0)
+    transactions = transactions.append_column("tx_token_type", pc.struct_field(first_log, "address"))
+
+    # -------------------------------------------------------------------------
+    # 2) Explode the receipt logs, linking each back to its transaction
+    # -------------------------------------------------------------------------
+    parents = pc.list_parent_indices(logs)
+    logs_table = pa.Table.from_struct_array(pc.list_flatten(logs))
+    logs_table = logs_table.add_column(0, "tx_hash", pc.take(transactions.column("tx_hash"), parents))
+    logs_table = logs_table.add_column(1, "block_number", pc.take(transactions.column("block_number"), parents))
+
+    transactions_df = transactions.to_pandas()
+    logs_df = logs_table.to_pandas()
+
+    return transactions_df, logs_df